@@ -2,6 +2,15 @@ import cv2
 import numpy as np
 import itertools
 
+# Unit ellipse sampled every 5 degrees, the same resolution cv2.ellipse uses when drawing large ellipses.
+# Scaled and shifted per detection to get the polygon of each ellipse without a cv2 call per detection.
+UNIT_ELLIPSE = np.stack([np.cos(np.radians(np.arange(0, 360, 5))),
+                         np.sin(np.radians(np.arange(0, 360, 5)))], axis=1)
+
+# Number of fractional bits in the polygon points. Matches the sub-pixel precision cv2.ellipse draws with internally,
+# so each batched ellipse has almost exactly the same outline as the one drawn by trace.
+POLYGON_SHIFT = 16
+
 
 def evaluate_ellipses(coords, draw_ellipse_requirements, ellipse_boxes, PHYSICAL_DISTANCE, REFERENCE_HEIGHT, M):
     """
@@ -84,6 +93,53 @@ def evaluate_overlapping(ellipse_boxes, are_coords_overlapped):
             are_coords_overlapped[ind2] = 1
 
 
+def evaluate_overlapping_pairs(ellipse_boxes):
+    """
+    Finds every pair of ellipses which are overlapping one another. Uses the same test as evaluate_overlapping,
+    but keeps track of which detections are too close to each other rather than only flagging them.
+
+    Args:
+        ellipse_boxes (list): List of detected bounding box coordinates with the current frame.
+
+    Returns:
+        overlapping_pairs (list): List of (index, index) tuples of the overlapping ellipses. The lower index is always first.
+    """
+
+    overlapping_pairs = []
+    for ind1, ind2 in itertools.combinations(list(range(0, len(ellipse_boxes))), 2):
+
+        if do_overlap(ellipse_boxes[ind1], ellipse_boxes[ind2]):
+            overlapping_pairs.append((ind1, ind2))
+
+    return overlapping_pairs
+
+
+def overlap_fraction(rect1, rect2):
+    """
+    Measures how much two rectangles overlap, as a fraction of the area of the smaller rectangle.
+    Used as a measure of how close two people got to one another.
+
+    Args:
+        rect1 (list): 4 corner coordinates of the first rectangle.
+        rect2 (list): 4 corner coordinates of the second rectangle.
+
+    Returns:
+        float: 0 if the rectangles do not overlap, up to 1 if the smaller rectangle lies entirely within the larger.
+    """
+
+    overlap_width = min(rect1[1], rect2[1]) - max(rect1[0], rect2[0])
+    overlap_height = min(rect1[3], rect2[3]) - max(rect1[2], rect2[2])
+    if overlap_width <= 0 or overlap_height <= 0:
+        return 0.0
+
+    smallest_area = min((rect1[1] - rect1[0]) * (rect1[3] - rect1[2]),
+                        (rect2[1] - rect2[0]) * (rect2[3] - rect2[2]))
+    if smallest_area <= 0:
+        return 0.0
+
+    return float(min(overlap_width * overlap_height / smallest_area, 1.0))
+
+
 def trace(frame, coords, draw_ellipse_requirements, are_coords_overlapped):
     """
     Draw the ellipses and head bounding boxes onto the current frame.
@@ -119,3 +175,108 @@ def trace(frame, coords, draw_ellipse_requirements, are_coords_overlapped):
 
         i += 1
 
+
+def ellipse_polygons(draw_ellipse_requirements):
+    """
+    Converts the ellipse parameters of a frame into closed polygons, all at once.
+
+    Args:
+        draw_ellipse_requirements (list): List of lists of the ellipse parameters to be drawn i.e. centre, height, width.
+
+    Returns:
+        np.array: n*72*2 array of the polygon points of each ellipse, with POLYGON_SHIFT fractional bits.
+    """
+
+    params = np.array(draw_ellipse_requirements, dtype=np.float64).reshape(-1, 4)
+    polygons = params[:, np.newaxis, 0:2] + params[:, np.newaxis, 2:4] * UNIT_ELLIPSE[np.newaxis]
+
+    return np.rint(polygons * (1 << POLYGON_SHIFT)).astype(np.int32)
+
+
+def box_polygons(coords):
+    """
+    Converts the head bounding boxes of a frame into closed polygons, all at once.
+
+    Args:
+        coords (list): List of the detection coordinates of the current frame.
+
+    Returns:
+        np.array: n*4*2 array of the corners of each bounding box.
+    """
+
+    left, right, top, bottom = np.array(coords).reshape(-1, 4).astype(np.int32).T
+
+    return np.stack([np.stack([left, top], axis=1),
+                     np.stack([right, top], axis=1),
+                     np.stack([right, bottom], axis=1),
+                     np.stack([left, bottom], axis=1)], axis=1)
+
+
+def trace_batched(frame, coords, draw_ellipse_requirements, are_coords_overlapped):
+    """
+    Draws the same ellipses and head bounding boxes as trace, but with a single cv2.polylines call per colour.
+    Opt-in via BATCHED_DRAWING, as it is not pixel-identical to trace where outlines of different colours cross.
+
+    Args:
+        frame (np.array): Current frame of the video.
+        coords (list): List of the detection coordinates of the current frame. Used to draw head bounding boxes.
+        draw_ellipse_requirements (list): List of lists of the ellipse parameters to be drawn i.e. centre, height, width.
+        are_coords_overlapped (list): Flags whether the ellipse should be green or red.
+    """
+
+    colours = [(0, 255, 0), (0, 0, 255)]
+
+    ellipses = ellipse_polygons(draw_ellipse_requirements)
+    boxes = box_polygons(coords)
+    flags = np.asarray(are_coords_overlapped, dtype=np.int32)
+
+    for flag, colour in enumerate(colours):
+        selected = flags == flag
+        if not selected.any():
+            continue
+
+        # Trace ellipses
+        cv2.polylines(frame, ellipses[selected], True, colour, 2, cv2.LINE_8, POLYGON_SHIFT)
+        # Draw bounding boxes around heads
+        cv2.polylines(frame, boxes[selected], True, colour, 1)
+
+
+def process_frame(detections, M, PHYSICAL_DISTANCE, REFERENCE_HEIGHT):
+    """
+    Runs the ellipse and overlap calculations for the detections of a single frame.
+    Does not touch the video frame itself, so can be used wherever the flags are needed without drawing.
+
+    Args:
+        detections (list): All detections and associated labels within the current frame.
+        M (np.array): 3*3 homography matrix. Used to transform any given point to bird's-eye view perspective.
+        PHYSICAL_DISTANCE (float): Distance in cm used with the REFERENCE_HEIGHT to estimate the scaling factor of the ellipses.
+        REFERENCE_HEIGHT (float): Estimated height of the average bounding box in cm. Used to scale the ellipses.
+
+    Returns:
+        coords (list): List of the detection coordinates of the current frame.
+        draw_ellipse_requirements (list): List of lists of the ellipse parameters to be drawn i.e. centre, height, width.
+        are_coords_overlapped (np.array): 1 or 0 at the indexes corresponding to the overlapped ellipses.
+        ellipse_boxes (list): List of bounding box coordinates of the detected ellipses.
+    """
+
+    #          LEFT       RIGHT      TOP        BOTTOM
+    coords = [[i['xmax'], i['xmin'], i['ymax'], i['ymin']] for i in detections]
+
+    are_coords_overlapped = np.zeros(np.shape(coords)[0])
+    draw_ellipse_requirements = []
+    ellipse_boxes = []
+
+    # Evaluate ellipses for each body detected
+    evaluate_ellipses(coords,
+                    draw_ellipse_requirements,
+                    ellipse_boxes,
+                    PHYSICAL_DISTANCE,
+                    REFERENCE_HEIGHT,
+                    M)
+
+    # Evaluate overlapping
+    evaluate_overlapping(ellipse_boxes,
+                        are_coords_overlapped)
+
+    return coords, draw_ellipse_requirements, are_coords_overlapped, ellipse_boxes
+
@@ -0,0 +1,167 @@
+import numpy as np
+
+import json
+
+from .ellipses import evaluate_overlapping_pairs, overlap_fraction
+
+
+class CentroidTracker:
+    """
+    Gives each detection an identity which persists across frames, so that the same two people being too close
+    in consecutive frames can be recognised as a single event.
+    Detections are greedily matched to the nearest track from the previous frames. If the detections already
+    carry a 'track_id' (e.g. from the inference service) that is used instead.
+
+    Args:
+        max_distance (float): Furthest, in pixels, a detection's ellipse centre can move between frames and still be matched to a track.
+        max_missed (int): Number of frames a track can go unmatched before it is forgotten.
+    """
+
+    def __init__(self, max_distance=50, max_missed=5):
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.next_id = 0
+        # Key: track ID, Value: [last ellipse centre (np.array), frame number last seen]
+        self.tracks = {}
+
+    def assign(self, frame_no, detections, draw_ellipse_requirements):
+        """
+        Assigns a track ID to every detection in the current frame.
+
+        Args:
+            frame_no (int): Current frame number.
+            detections (list): All detections and associated labels within the current frame.
+            draw_ellipse_requirements (list): List of lists of the ellipse parameters i.e. centre, height, width.
+
+        Returns:
+            track_ids (list): Track ID of each detection, in the same order as the detections.
+        """
+
+        if all('track_id' in detection for detection in detections):
+            return [detection['track_id'] for detection in detections]
+
+        centres = np.array([[i[0], i[1]] for i in draw_ellipse_requirements], dtype="float32").reshape(-1, 2)
+        track_ids = [None] * len(centres)
+
+        existing_ids = list(self.tracks)
+        if existing_ids and len(centres):
+            previous = np.array([self.tracks[track_id][0] for track_id in existing_ids])
+            distances = np.linalg.norm(centres[:, np.newaxis, :] - previous[np.newaxis, :, :], axis=2)
+
+            # Closest pairings are matched first. Each detection and track can only be used once.
+            used_tracks = set()
+            for flat_index in np.argsort(distances, axis=None):
+                ind, track_ind = np.unravel_index(flat_index, distances.shape)
+                if distances[ind, track_ind] > self.max_distance:
+                    break
+                if track_ids[ind] is not None or track_ind in used_tracks:
+                    continue
+                track_ids[ind] = existing_ids[track_ind]
+                used_tracks.add(track_ind)
+
+        for ind, centre in enumerate(centres):
+            if track_ids[ind] is None:
+                track_ids[ind] = self.next_id
+                self.next_id += 1
+            self.tracks[track_ids[ind]] = [centre, frame_no]
+
+        # Forget about anyone who has left the scene, so the table only ever holds people currently in view.
+        for track_id in [t for t, (_, last_seen) in self.tracks.items() if frame_no - last_seen > self.max_missed]:
+            del self.tracks[track_id]
+
+        return track_ids
+
+
+class ViolationEventBuilder:
+    """
+    Incrementally builds pair-level violation events from the per-frame results.
+    Only the violations which are currently ongoing are held in memory. Consecutive frames of the same pair
+    being too close are merged into one event, which is written out as a line of JSON as soon as it ends.
+
+    Args:
+        outfile (file): Open, writable file object which the JSONL events are streamed to.
+        fps (float): Frames per second of the input video. Used to report the duration of each event in seconds.
+        max_gap (int): Number of frames a pair can be apart for without ending the event e.g. because of a missed detection.
+        tracker (CentroidTracker): Used to give each detection an identity across frames.
+    """
+
+    def __init__(self, outfile, fps, max_gap=0, tracker=None):
+        self.outfile = outfile
+        self.fps = fps
+        self.max_gap = max_gap
+        self.tracker = tracker if tracker is not None else CentroidTracker()
+        self.last_frame = 0
+        # Key: (track ID, track ID), Value: details of the ongoing event
+        self.open_events = {}
+
+    def update(self, frame_no, detections, draw_ellipse_requirements, ellipse_boxes):
+        """
+        Adds the results of the current frame. Opens events for new violations, extends those which are ongoing,
+        and closes any which have not been seen for more than max_gap frames.
+
+        Args:
+            frame_no (int): Current frame number. Repeated or out of order frames are ignored.
+            detections (list): All detections and associated labels within the current frame.
+            draw_ellipse_requirements (list): List of lists of the ellipse parameters i.e. centre, height, width.
+            ellipse_boxes (list): List of bounding box coordinates of the detected ellipses.
+        """
+
+        # matplotlib draws the first frame twice when setting up an animation, so guard against re-processing it.
+        if frame_no <= self.last_frame:
+            return
+        self.last_frame = frame_no
+
+        track_ids = self.tracker.assign(frame_no, detections, draw_ellipse_requirements)
+
+        for ind1, ind2 in evaluate_overlapping_pairs(ellipse_boxes):
+            pair = tuple(sorted((track_ids[ind1], track_ids[ind2])))
+            overlap = overlap_fraction(ellipse_boxes[ind1], ellipse_boxes[ind2])
+
+            event = self.open_events.get(pair)
+            # Frames can be skipped entirely, so an event may have ended even though it was never closed below.
+            if event is not None and frame_no - event["end_frame"] - 1 > self.max_gap:
+                self._emit(pair, self.open_events.pop(pair))
+                event = None
+
+            if event is None:
+                self.open_events[pair] = {"start_frame": frame_no,
+                                          "end_frame": frame_no,
+                                          "frames": 1,
+                                          "max_overlap": overlap}
+            else:
+                event["end_frame"] = frame_no
+                event["frames"] += 1
+                event["max_overlap"] = max(event["max_overlap"], overlap)
+
+        for pair in [p for p, event in self.open_events.items() if frame_no - event["end_frame"] > self.max_gap]:
+            self._emit(pair, self.open_events.pop(pair))
+
+    def close(self):
+        """
+        Closes all ongoing events. Called once the final frame has been processed.
+        """
+
+        for pair in sorted(self.open_events, key=lambda p: self.open_events[p]["start_frame"]):
+            self._emit(pair, self.open_events[pair])
+        self.open_events = {}
+        self.outfile.flush()
+
+    def _emit(self, pair, event):
+        """
+        Writes a closed event to the output file as a single line of JSON.
+
+        Args:
+            pair (tuple): Track IDs of the two people involved.
+            event (dict): Details of the event.
+        """
+
+        duration_frames = event["end_frame"] - event["start_frame"] + 1
+        record = {
+            "pair": [int(track_id) if isinstance(track_id, np.integer) else track_id for track_id in pair],
+            "start_frame": event["start_frame"],
+            "end_frame": event["end_frame"],
+            "frames": event["frames"],
+            "duration_seconds": round(duration_frames / self.fps, 3) if self.fps else None,
+            "max_overlap": round(event["max_overlap"], 4),
+        }
+        self.outfile.write(json.dumps(record) + "\n")
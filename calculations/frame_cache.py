@@ -0,0 +1,286 @@
+import cv2
+import numpy as np
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+# Every file the cache writes is named after the 40 character SHA-1 key of its video.
+# Temporary files also carry a random part, so that concurrent runs never write to the same file.
+# Anything else in the cache directory is left alone.
+FRAMES_EXTENSION = '.frames'
+METADATA_EXTENSION = '.framecache.json'
+TEMP_EXTENSION = '.tmp'
+CACHE_FILE = re.compile(r"^([0-9a-f]{40})(\.frames|\.framecache\.json|[a-z0-9_]*\.(?:frames|framecache\.json)\.tmp)$")
+
+# Temporary files and incomplete entries older than this, in seconds, are assumed to be left over from an
+# interrupted run rather than being written by another run which is still decoding.
+STALE_SECONDS = 60 * 60
+
+
+class CachedCapture:
+    """
+    Stands in for cv2.VideoCapture when reading from the frame cache. Supports the subset of the VideoCapture
+    interface used by this repository, but seeking is free as every frame has already been decoded.
+
+    Args:
+        frames (np.memmap): Read-only array of shape (frames, height, width, 3) holding the decoded BGR frames.
+        fps (float): Frames per second of the original video.
+    """
+
+    def __init__(self, frames, fps):
+        self.frames = frames
+        self.fps = fps
+        self.position = 0
+
+    def get(self, prop_id):
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.frames.shape[2])
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.frames.shape[1])
+        if prop_id == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop_id == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frames.shape[0])
+        if prop_id == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        return 0.0
+
+    def set(self, prop_id, value):
+        if prop_id == cv2.CAP_PROP_POS_FRAMES:
+            self.position = int(value)
+            return True
+        return False
+
+    def read(self):
+        if self.position < 0 or self.position >= self.frames.shape[0]:
+            return False, None
+
+        # Copy out of the memory map, as the ellipses are drawn directly onto the returned frame.
+        image = np.array(self.frames[self.position])
+        self.position += 1
+        return True, image
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+
+class FrameCache:
+    """
+    Decodes each video once into a raw uint8 file on disk, which later runs memory-map instead of decoding the video again.
+    Useful when repeatedly re-running the same clip while tuning PHYSICAL_DISTANCE, REFERENCE_HEIGHT or the calibration.
+    The total size of the cache is capped, and the least recently used videos are evicted to make room for new ones.
+
+    Args:
+        cache_dir (str): Directory where the decoded frames are stored.
+        max_bytes (int): Maximum total size of the decoded frames held in the cache.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def open(self, video_path):
+        """
+        Opens a video, decoding it into the cache first if it is not already there.
+        If the video is too large to ever fit in the cache then it is read directly instead.
+
+        Args:
+            video_path (str): Path to the input video.
+
+        Returns:
+            CachedCapture or cv2.VideoCapture: Object to read frames of the video from.
+            bool: True if the frames were already cached.
+        """
+
+        key = self._key(video_path)
+        metadata = self._load_metadata(key)
+
+        if metadata is not None:
+            metadata['last_used'] = time.time()
+            self._save_metadata(key, metadata)
+            return self._capture(key, metadata), True
+
+        cap = cv2.VideoCapture(video_path)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        required_bytes = total_frames * height * width * 3
+        if required_bytes == 0 or required_bytes > self.max_bytes:
+            return cap, False
+
+        self._evict(self.max_bytes - required_bytes)
+
+        # Decode to a temporary file, and only rename it into place once complete, so an interrupted run
+        # never leaves a half-written video in the cache.
+        temp_path = self._temp_path(key, FRAMES_EXTENSION)
+        try:
+            frames = np.memmap(temp_path, dtype=np.uint8, mode='w+', shape=(total_frames, height, width, 3))
+
+            decoded = 0
+            for i in range(total_frames):
+                res, image = cap.read()
+                if not res:
+                    break
+                frames[i] = image
+                decoded += 1
+
+            frames.flush()
+            del frames
+
+            # Another run may have decoded the same video in the meantime, in which case use its copy.
+            existing = self._load_metadata(key)
+            if existing is not None:
+                return self._capture(key, existing), False
+
+            # The frame count reported by some containers is only an estimate, so trim the file to what was decoded.
+            with open(temp_path, 'r+b') as f:
+                f.truncate(decoded * height * width * 3)
+            os.replace(temp_path, self._path(key, FRAMES_EXTENSION))
+        finally:
+            cap.release()
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+
+        metadata = {"video_path": os.path.abspath(video_path),
+                    "shape": [decoded, height, width, 3],
+                    "fps": fps,
+                    "last_used": time.time()}
+        self._save_metadata(key, metadata)
+
+        return self._capture(key, metadata), False
+
+    def _capture(self, key, metadata):
+        if metadata['shape'][0] == 0:
+            frames = np.zeros(metadata['shape'], dtype=np.uint8)
+        else:
+            frames = np.memmap(self._path(key, FRAMES_EXTENSION), dtype=np.uint8, mode='r', shape=tuple(metadata['shape']))
+        return CachedCapture(frames, metadata['fps'])
+
+    def _evict(self, budget_bytes):
+        """
+        Removes the least recently used videos until the cache takes up no more than budget_bytes.
+        Also removes files left behind by interrupted runs, e.g. decoded frames without any metadata. These are only
+        removed once they are older than STALE_SECONDS, as until then another run may still be writing them.
+        Only files written by the cache are considered, so nothing else in the directory is ever deleted.
+
+        Args:
+            budget_bytes (int): Maximum size the cache can take up once eviction is complete.
+        """
+
+        keys = set()
+        total_bytes = 0
+        for filename in os.listdir(self.cache_dir):
+            match = CACHE_FILE.match(filename)
+            if match is None:
+                continue
+
+            if not filename.endswith(TEMP_EXTENSION):
+                keys.add(match.group(1))
+                continue
+
+            temp_path = os.path.join(self.cache_dir, filename)
+            try:
+                if self._age(temp_path) > STALE_SECONDS:
+                    os.remove(temp_path)
+                else:
+                    total_bytes += os.path.getsize(temp_path)
+            except FileNotFoundError:
+                pass
+
+        entries = []
+        for key in keys:
+            metadata = self._load_metadata(key)
+            if metadata is None:
+                # Incomplete or unreadable, but it may be part way through being written by another run.
+                ages = [self._age(self._path(key, extension)) for extension in [FRAMES_EXTENSION, METADATA_EXTENSION]]
+                if all(age > STALE_SECONDS for age in ages):
+                    self._remove(key)
+                else:
+                    total_bytes += self._size(key)
+                continue
+
+            entries.append((metadata['last_used'], key))
+            total_bytes += self._size(key)
+
+        for _, key in sorted(entries):
+            if total_bytes <= budget_bytes:
+                break
+            total_bytes -= self._size(key)
+            self._remove(key)
+
+    def _key(self, video_path):
+        """
+        Videos are identified by their path, size and modification time, so a replaced video is decoded again.
+        """
+
+        stat = os.stat(video_path)
+        identity = f"{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        return hashlib.sha1(identity.encode()).hexdigest()
+
+    def _path(self, key, extension):
+        return os.path.join(self.cache_dir, key + extension)
+
+    def _temp_path(self, key, extension):
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=key, suffix=extension + TEMP_EXTENSION)
+        os.close(fd)
+        return temp_path
+
+    def _age(self, path):
+        """
+        Seconds since a file was last modified. Missing files count as infinitely old.
+        """
+
+        try:
+            return time.time() - os.path.getmtime(path)
+        except FileNotFoundError:
+            return float('inf')
+
+    def _size(self, key):
+        try:
+            return os.path.getsize(self._path(key, FRAMES_EXTENSION))
+        except FileNotFoundError:
+            return 0
+
+    def _remove(self, key):
+        for extension in [METADATA_EXTENSION, FRAMES_EXTENSION]:
+            try:
+                os.remove(self._path(key, extension))
+            except FileNotFoundError:
+                pass
+
+    def _load_metadata(self, key):
+        try:
+            with open(self._path(key, METADATA_EXTENSION)) as f:
+                metadata = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        # A missing frames file means the entry is incomplete, so treat it as a cache miss.
+        if not os.path.exists(self._path(key, FRAMES_EXTENSION)):
+            return None
+        return metadata
+
+    def _save_metadata(self, key, metadata):
+        # Written to a temporary file first, so other runs never read a half-written file.
+        temp_path = self._temp_path(key, METADATA_EXTENSION)
+        try:
+            with open(temp_path, 'w') as outfile:
+                json.dump(metadata, outfile)
+            os.replace(temp_path, self._path(key, METADATA_EXTENSION))
+        finally:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
@@ -4,7 +4,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 
-from .ellipses import evaluate_ellipses, evaluate_overlapping, trace
+from .ellipses import process_frame, trace, trace_batched
 
 from colorama import Fore, Back, Style
 from colorama import init
@@ -60,7 +60,7 @@ def setup_figure(VIDEO_WIDTH, VIDEO_HEIGHT):
     return fig, a0, a1, plt
 
 
-def animate(frame, cap, sorted_detections, M, im, scatter, a0, a1, PHYSICAL_DISTANCE, REFERENCE_HEIGHT, ELLIPSE_WIDTH_SCALE, ELLIPSE_HEIGHT_SCALE):
+def animate(frame, cap, sorted_detections, M, im, scatter, a0, a1, PHYSICAL_DISTANCE, REFERENCE_HEIGHT, ELLIPSE_WIDTH_SCALE, ELLIPSE_HEIGHT_SCALE, event_builder=None, batched_drawing=False):
     """
     Animate function which updates the FuncAnimation class used to generate the output video. Processes the current frame of video and
     returns the updated scatter plot coordinates and ellipse patches (for the bird's-eye perspective) as well as the final drawn frame. 
@@ -80,6 +80,8 @@ def animate(frame, cap, sorted_detections, M, im, scatter, a0, a1, PHYSICAL_DIST
         REFERENCE_HEIGHT (float): Estimated height of the average bounding box in cm. Used to scale the ellipses. 
         ELLIPSE_WIDTH_SCALE (float): 
         ELLIPSE_HEIGHT_SCALE (float):
+        event_builder (ViolationEventBuilder): Optional. Records the pairs of detections which are too close to one another.
+        batched_drawing (bool): Optional. Draw with trace_batched instead of trace.
 
     Returns:
         scatter (matplotlib.collections.PathCollection): Updated scatter plot coordinates of the detections in the current frame.
@@ -106,27 +108,17 @@ def animate(frame, cap, sorted_detections, M, im, scatter, a0, a1, PHYSICAL_DIST
     res, image = cap.read()
 
     detections = sorted_detections[frame_no]
-    #          LEFT       RIGHT      TOP        BOTTOM
-    coords = [[i['xmax'], i['xmin'], i['ymax'], i['ymin']] for i in detections]
+    coords, draw_ellipse_requirements, are_coords_overlapped, ellipse_boxes = process_frame(detections,
+                                                                                           M,
+                                                                                           PHYSICAL_DISTANCE,
+                                                                                           REFERENCE_HEIGHT)
 
-    are_coords_overlapped = np.zeros(np.shape(coords)[0])
-    draw_ellipse_requirements = []
-    ellipse_boxes = []
-
-    # Evaluate ellipses for each body detected 
-    evaluate_ellipses(coords,
-                    draw_ellipse_requirements,
-                    ellipse_boxes,
-                    PHYSICAL_DISTANCE,
-                    REFERENCE_HEIGHT,
-                    M)
-
-    # Evaluate overlapping
-    evaluate_overlapping(ellipse_boxes,
-                        are_coords_overlapped)
+    if event_builder is not None:
+        event_builder.update(frame_no, detections, draw_ellipse_requirements, ellipse_boxes)
 
     # Trace results over output frame
-    trace(image,
+    draw = trace_batched if batched_drawing else trace
+    draw(image,
         coords,
         draw_ellipse_requirements,
         are_coords_overlapped)
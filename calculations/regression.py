@@ -0,0 +1,236 @@
+import cv2
+import numpy as np
+
+import json
+import time
+
+from .ellipses import process_frame, trace
+
+
+def synthetic_detections(total_frames, detections_per_frame, video_width, video_height, seed=0):
+    """
+    Generates a reproducible set of head detections in the same format as the local detections file.
+    People are scattered in loose pairs so that every frame contains a mix of overlapping and isolated ellipses.
+
+    Args:
+        total_frames (int): Number of frames to generate detections for.
+        detections_per_frame (int): Number of detections within each frame.
+        video_width (int): Width of the synthetic video.
+        video_height (int): Height of the synthetic video.
+        seed (int): Seed of the random generator. The same seed always produces the same detections.
+
+    Returns:
+        raw_detections (list): Unordered detections, ready to be passed to sort_detections.
+    """
+
+    rng = np.random.RandomState(seed)
+    raw_detections = []
+
+    for i in range(total_frames):
+        frame_no = i + 1
+        group_centres = rng.uniform([0.1 * video_width, 0.2 * video_height],
+                                    [0.9 * video_width, 0.9 * video_height],
+                                    size=(max(detections_per_frame // 2, 1), 2))
+
+        for j in range(detections_per_frame):
+            centre = group_centres[j % len(group_centres)] + rng.normal(0, 150, size=2)
+            size = rng.uniform(20, 45)
+            left = int(round(np.clip(centre[0] - size / 2, 0, video_width - size)))
+            top = int(round(np.clip(centre[1] - size / 2, 0, video_height - size)))
+
+            raw_detections.append({
+                "_id": "synthetic",
+                "confidence": 1.00,
+                "ymax": top + int(round(size)),
+                "label": "person",
+                "xmax": left,
+                "xmin": left + int(round(size)),
+                "ymin": top,
+                "frame_number": f"{frame_no}",
+                "time_offset": 0.00,
+                "sequence_number": 0.00,
+                "infer_id": "synthetic",
+            })
+
+    return raw_detections
+
+
+def collect_outputs(sorted_detections, M, PHYSICAL_DISTANCE, REFERENCE_HEIGHT):
+    """
+    Runs the ellipse and overlap calculations over every frame and gathers the results into a serialisable form.
+
+    Args:
+        sorted_detections (dict): Sorted detections of the input video.
+                                  Key: frame number
+                                  Value: all detections and associated labels within that frame
+        M (np.array): 3*3 homography matrix. Used to transform any given point to bird's-eye view perspective.
+        PHYSICAL_DISTANCE (float): Distance in cm used with the REFERENCE_HEIGHT to estimate the scaling factor of the ellipses.
+        REFERENCE_HEIGHT (float): Estimated height of the average bounding box in cm. Used to scale the ellipses.
+
+    Returns:
+        outputs (dict): Key: frame number (str)
+                        Value: the ellipse parameters and overlap flags of that frame
+    """
+
+    outputs = {}
+    for frame_no, detections in sorted_detections.items():
+        _, draw_ellipse_requirements, are_coords_overlapped, _ = process_frame(detections,
+                                                                              M,
+                                                                              PHYSICAL_DISTANCE,
+                                                                              REFERENCE_HEIGHT)
+        outputs[str(frame_no)] = {
+            "ellipses": [[int(value) for value in ellipse] for ellipse in draw_ellipse_requirements],
+            "overlapped": [int(flag) for flag in are_coords_overlapped],
+        }
+
+    return outputs
+
+
+def compare_outputs(outputs, golden_outputs):
+    """
+    Compares freshly calculated outputs against the stored golden outputs.
+
+    Args:
+        outputs (dict): Outputs of the current code, as returned by collect_outputs.
+        golden_outputs (dict): Previously recorded outputs which are known to be correct.
+
+    Returns:
+        mismatches (list): Human readable description of every frame which differs. Empty if the outputs match.
+    """
+
+    mismatches = []
+
+    for frame_no in sorted(set(outputs) | set(golden_outputs), key=int):
+        if frame_no not in golden_outputs:
+            mismatches.append(f"Frame {frame_no}: missing from the golden outputs")
+            continue
+        if frame_no not in outputs:
+            mismatches.append(f"Frame {frame_no}: missing from the current outputs")
+            continue
+
+        current = outputs[frame_no]
+        golden = golden_outputs[frame_no]
+        if current["overlapped"] != golden["overlapped"]:
+            mismatches.append(f"Frame {frame_no}: overlap flags {current['overlapped']} != {golden['overlapped']}")
+        if current["ellipses"] != golden["ellipses"]:
+            mismatches.append(f"Frame {frame_no}: ellipse parameters {current['ellipses']} != {golden['ellipses']}")
+
+    return mismatches
+
+
+def measure_throughput(frames, sorted_detections, M, PHYSICAL_DISTANCE, REFERENCE_HEIGHT, repeats=5):
+    """
+    Measures the frames per second of the per-frame pipeline i.e. calculating the ellipses and overlaps, and tracing
+    the results onto the frame. The best of several repeats is taken to smooth over noise from the rest of the machine.
+
+    Args:
+        frames (callable): Returns a fresh iterator of (frame number, frame) tuples each time it is called.
+        sorted_detections (dict): Sorted detections of the input video.
+        M (np.array): 3*3 homography matrix. Used to transform any given point to bird's-eye view perspective.
+        PHYSICAL_DISTANCE (float): Distance in cm used with the REFERENCE_HEIGHT to estimate the scaling factor of the ellipses.
+        REFERENCE_HEIGHT (float): Estimated height of the average bounding box in cm. Used to scale the ellipses.
+        repeats (int): Number of timed passes over the frames.
+
+    Returns:
+        fps (float): Best frames per second achieved across the repeats.
+    """
+
+    best_fps = 0.0
+    for _ in range(repeats):
+        processed = 0
+        start = time.perf_counter()
+
+        for frame_no, image in frames():
+            coords, draw_ellipse_requirements, are_coords_overlapped, _ = process_frame(sorted_detections[frame_no],
+                                                                                       M,
+                                                                                       PHYSICAL_DISTANCE,
+                                                                                       REFERENCE_HEIGHT)
+            trace(image, coords, draw_ellipse_requirements, are_coords_overlapped)
+            processed += 1
+
+        elapsed = time.perf_counter() - start
+        if processed and elapsed > 0:
+            best_fps = max(best_fps, processed / elapsed)
+
+    return best_fps
+
+
+def video_frames(video_input_path, total_frames):
+    """
+    Builds a frame source from the input video. Every frame is decoded up front, so that decoding is excluded
+    from the timed loop and only the per-frame pipeline is measured.
+
+    Args:
+        video_input_path (str): Path to the input video.
+        total_frames (int): Number of frames to read.
+
+    Returns:
+        frames (callable): Returns a fresh iterator of (frame number, frame) tuples each time it is called.
+    """
+
+    decoded = []
+    cap = cv2.VideoCapture(video_input_path)
+    try:
+        for i in range(total_frames):
+            res, image = cap.read()
+            if not res:
+                break
+            decoded.append(image)
+    finally:
+        cap.release()
+
+    def frames():
+        for i, image in enumerate(decoded):
+            yield i + 1, image.copy()
+
+    return frames
+
+
+def blank_frames(total_frames, video_width, video_height):
+    """
+    Builds a frame source of blank frames. Used with synthetic detections so that decoding cost is excluded.
+
+    Args:
+        total_frames (int): Number of frames to yield.
+        video_width (int): Width of each frame.
+        video_height (int): Height of each frame.
+
+    Returns:
+        frames (callable): Returns a fresh iterator of (frame number, frame) tuples each time it is called.
+    """
+
+    blank = np.zeros((video_height, video_width, 3), np.uint8)
+
+    def frames():
+        for i in range(total_frames):
+            yield i + 1, blank.copy()
+
+    return frames
+
+
+def load_json(path):
+    """
+    Loads a golden output or baseline .json file.
+
+    Args:
+        path (str): Path to the .json file.
+
+    Returns:
+        dict: Contents of the file.
+    """
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(obj, path):
+    """
+    Saves a golden output or baseline .json file.
+
+    Args:
+        obj (dict): Contents to be saved.
+        path (str): Path to the .json file.
+    """
+
+    with open(path, 'w') as outfile:
+        json.dump(obj, outfile, indent=1)
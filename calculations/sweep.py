@@ -0,0 +1,144 @@
+import cv2
+import numpy as np
+
+
+def project_detections(coords, M):
+    """
+    Calculates everything about the ellipses of a frame which does not depend on PHYSICAL_DISTANCE or REFERENCE_HEIGHT.
+    This is the same geometry as evaluate_ellipses, but with every detection transformed in a single call so
+    that it can be shared between all of the parameter sets in a sweep.
+
+    Args:
+        coords (list): List of lists of the bounding box detections picked up in the current video frame.
+        M (np.array): 3*3 homography matrix. Used to transform any given point to bird's-eye view perspective.
+
+    Returns:
+        centres (np.array): X-coordinate of the centre of each bounding box.
+        bottoms (np.array): Bottom of each bounding box.
+        heights (list): Height of each bounding box.
+        widths (np.array): Bird's-eye width of each ellipse.
+    """
+
+    coords = np.array(coords).reshape(-1, 4)
+    left, right, top, bottom = coords.T
+
+    centres = ((left + right) / 2).astype(np.int32)
+    heights = (top - bottom).tolist()
+
+    if len(coords) == 0:
+        return centres, bottom, heights, np.zeros(0, np.int64)
+
+    pts = np.stack([np.stack([centres, top], axis=1),
+                    np.stack([centres, bottom], axis=1)], axis=1).astype(np.float32)  # (n, 2, 2)
+    dst = cv2.perspectiveTransform(pts.reshape(-1, 1, 2), M).reshape(-1, 2, 2)
+    widths = (dst[:, 0, 1] - dst[:, 1, 1]).astype(np.int64)
+
+    return centres, bottom, heights, widths
+
+
+def overlapping_flags(lefts, rights, vertical_overlaps):
+    """
+    Vectorised form of evaluate_overlapping, using the same edge conditions as do_overlap.
+
+    Args:
+        lefts (np.array): Left edge of each ellipse bounding box.
+        rights (np.array): Right edge of each ellipse bounding box.
+        vertical_overlaps (np.array): n*n boolean matrix of which ellipse boxes overlap vertically.
+                                      This does not depend on the parameters, so is calculated once per frame.
+
+    Returns:
+        np.array: 1 or 0 at the indexes corresponding to the overlapped ellipses.
+    """
+
+    overlaps = ~(lefts[:, np.newaxis] >= rights[np.newaxis, :]) & ~(lefts[np.newaxis, :] >= rights[:, np.newaxis])
+    overlaps &= vertical_overlaps
+    np.fill_diagonal(overlaps, False)
+
+    return overlaps.any(axis=1).astype(np.float64)
+
+
+def sweep_frame(coords, M, parameter_sets, return_ellipses=False):
+    """
+    Calculates the ellipses and overlap flags of a single frame for several parameter sets at once.
+
+    Args:
+        coords (list): List of lists of the bounding box detections picked up in the current video frame.
+        M (np.array): 3*3 homography matrix. Used to transform any given point to bird's-eye view perspective.
+        parameter_sets (list): List of dicts, each with a PHYSICAL_DISTANCE and REFERENCE_HEIGHT.
+        return_ellipses (bool): Whether to also build the ellipse parameters needed for drawing. This is a Python
+                                loop over the detections, so it is skipped unless asked for.
+
+    Returns:
+        results (list): For each parameter set, a (draw_ellipse_requirements, are_coords_overlapped) tuple
+                        matching the output of process_frame. draw_ellipse_requirements is None unless return_ellipses is set.
+    """
+
+    centres, bottoms, heights, widths = project_detections(coords, M)
+
+    tops = bottoms - widths
+    lower = bottoms + widths
+    vertical_overlaps = ~(lower[:, np.newaxis] <= tops[np.newaxis, :]) & ~(lower[np.newaxis, :] <= tops[:, np.newaxis])
+
+    results = []
+    for parameters in parameter_sets:
+        scaling_factor = parameters['PHYSICAL_DISTANCE'] / parameters['REFERENCE_HEIGHT']
+        # Python's round is kept, rather than np.round, so the results exactly match evaluate_ellipses.
+        calculated_heights = np.array([round(scaling_factor * height, 2) for height in heights], dtype=np.float64)
+
+        are_coords_overlapped = overlapping_flags(centres - calculated_heights,
+                                                  centres + calculated_heights,
+                                                  vertical_overlaps)
+
+        draw_ellipse_requirements = None
+        if return_ellipses:
+            draw_ellipse_requirements = [[int(centre), int(bottom), int(calculated_height), int(width)]
+                                         for centre, bottom, calculated_height, width
+                                         in zip(centres, bottoms, calculated_heights, widths)]
+
+        results.append((draw_ellipse_requirements, are_coords_overlapped))
+
+    return results
+
+
+def sweep(sorted_detections, M, parameter_sets):
+    """
+    Runs every parameter set over all of the detections in a single pass, and summarises how many violations each produces.
+
+    Args:
+        sorted_detections (dict): Sorted detections of the input video.
+                                  Key: frame number
+                                  Value: all detections and associated labels within that frame
+        M (np.array): 3*3 homography matrix. Used to transform any given point to bird's-eye view perspective.
+        parameter_sets (list): List of dicts, each with a PHYSICAL_DISTANCE and REFERENCE_HEIGHT.
+
+    Returns:
+        summaries (list): For each parameter set, a dict of the parameters along with:
+                          detections - total number of detections
+                          violations - number of detections flagged as too close to someone
+                          violation_rate - fraction of detections flagged
+                          frames_with_violations - number of frames with at least one violation
+                          frames - total number of frames
+    """
+
+    summaries = [{"PHYSICAL_DISTANCE": parameters['PHYSICAL_DISTANCE'],
+                  "REFERENCE_HEIGHT": parameters['REFERENCE_HEIGHT'],
+                  "detections": 0,
+                  "violations": 0,
+                  "frames_with_violations": 0,
+                  "frames": len(sorted_detections)}
+                 for parameters in parameter_sets]
+
+    for frame_no, detections in sorted_detections.items():
+        #          LEFT       RIGHT      TOP        BOTTOM
+        coords = [[i['xmax'], i['xmin'], i['ymax'], i['ymin']] for i in detections]
+
+        for summary, (_, are_coords_overlapped) in zip(summaries, sweep_frame(coords, M, parameter_sets)):
+            violations = int(are_coords_overlapped.sum())
+            summary["detections"] += len(coords)
+            summary["violations"] += violations
+            summary["frames_with_violations"] += int(violations > 0)
+
+    for summary in summaries:
+        summary["violation_rate"] = summary["violations"] / summary["detections"] if summary["detections"] else 0.0
+
+    return summaries
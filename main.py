@@ -1,6 +1,8 @@
 from calculations.homography import four_point_transform
 from calculations.output import setup_figure, animate
 from calculations.calibration import calibrate
+from calculations.events import ViolationEventBuilder
+from calculations.frame_cache import FrameCache
 from inference.detect import get_raw_detections, sort_detections
 
 import numpy as np
@@ -24,6 +26,13 @@ CALIBRATION_COORDS_PATH = settings['CALIBRATION_COORDS_PATH']
 PHYSICAL_DISTANCE = settings['PHYSICAL_DISTANCE']
 REFERENCE_HEIGHT = settings['REFERENCE_HEIGHT']
 DPI = settings['DPI']
+# Optional. If set, the pairs of people who were too close are streamed to this .jsonl file.
+EVENTS_OUTPUT_PATH = settings.get('EVENTS_OUTPUT_PATH', '')
+# Optional. If set, decoded frames are cached here so re-runs of the same video skip decoding.
+FRAME_CACHE_DIR = settings.get('FRAME_CACHE_DIR', '')
+FRAME_CACHE_MAX_GB = settings.get('FRAME_CACHE_MAX_GB', 10)
+# Optional. Experimental batched drawing path, see trace_batched.
+BATCHED_DRAWING = settings.get('BATCHED_DRAWING', "False") == "True"
 
 if settings['LOCAL_RUN'] == "False":
     LOCAL_RUN = False
@@ -40,7 +49,11 @@ ELLIPSE_HEIGHT_SCALE = 2
 
 # -------------------------------------------------------------
 
-cap = cv2.VideoCapture(VIDEO_INPUT_PATH)
+if FRAME_CACHE_DIR:
+    frame_cache = FrameCache(FRAME_CACHE_DIR, int(FRAME_CACHE_MAX_GB * 1024 ** 3))
+    cap, cache_hit = frame_cache.open(VIDEO_INPUT_PATH)
+else:
+    cap = cv2.VideoCapture(VIDEO_INPUT_PATH)
 
 VIDEO_WIDTH = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
 VIDEO_HEIGHT = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
@@ -56,6 +69,12 @@ print(
     f"-------------------------------------------"
 )
 
+if FRAME_CACHE_DIR:
+    print(f"Frame cache: {Fore.GREEN + 'hit' if cache_hit else Fore.YELLOW + 'miss'}{Style.RESET_ALL} "
+          f"({Style.BRIGHT}{FRAME_CACHE_DIR}{Style.RESET_ALL}) \n"
+          f"-------------------------------------------"
+    )
+
 if not LOCAL_RUN:
     with open(VISUAL_INSIGHTS_CREDS_PATH) as f:
         info = json.load(f)
@@ -98,6 +117,15 @@ pts = np.array(calibration_coords, dtype = "float32")
 # the image. M is our homography matrix. This will be used to transform all other points to the same perspective.
 warped, M = four_point_transform(image, pts)
 
+if EVENTS_OUTPUT_PATH:
+    print(f"Violation events will be saved to: {Style.BRIGHT}{EVENTS_OUTPUT_PATH}{Style.RESET_ALL} \n"
+          f"-------------------------------------------"
+    )
+    events_file = open(EVENTS_OUTPUT_PATH, 'w')
+    event_builder = ViolationEventBuilder(events_file, FPS)
+else:
+    event_builder = None
+
 animation = FuncAnimation(fig,
                           animate,
                           frames=np.arange(TOTAL_FRAMES),
@@ -111,10 +139,19 @@ animation = FuncAnimation(fig,
                                  PHYSICAL_DISTANCE,
                                  REFERENCE_HEIGHT,
                                  ELLIPSE_WIDTH_SCALE,
-                                 ELLIPSE_HEIGHT_SCALE],
+                                 ELLIPSE_HEIGHT_SCALE,
+                                 event_builder,
+                                 BATCHED_DRAWING],
                            interval=1000 / FPS)
 
-animation.save(VIDEO_OUTPUT_PATH, dpi=DPI)
+try:
+    animation.save(VIDEO_OUTPUT_PATH, dpi=DPI)
+finally:
+    # Close the events file even if saving fails part way, so the events found so far are not lost.
+    if event_builder is not None:
+        event_builder.close()
+        events_file.close()
+
 print("Processing complete!")
 
 # -------------------------------------------------------------
\ No newline at end of file
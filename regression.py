@@ -0,0 +1,136 @@
+from calculations.homography import four_point_transform
+from calculations.calibration import calibrate
+from calculations.regression import (synthetic_detections, collect_outputs, compare_outputs, measure_throughput,
+                                     video_frames, blank_frames, load_json, save_json)
+from inference.detect import get_raw_detections, sort_detections
+
+import numpy as np
+import cv2
+
+import argparse
+import os
+import sys
+from colorama import Fore, Back, Style
+from colorama import init
+init(autoreset=True)
+
+# ----------------------- SETTINGS -----------------------------
+
+# Regression runs are pinned to the bundled Oxford snippet, rather than whatever settings.json currently points at,
+# so that the golden outputs stay meaningful as the settings are changed for new videos.
+VIDEO_INPUT_PATH = "./data/videos/oxford_snipped.mp4"
+CALIBRATION_COORDS_PATH = "./calibration_coords.json"
+DETECTIONS_FILE = "./data/labels/oxford_snipped_labels.json"
+PHYSICAL_DISTANCE = 100
+REFERENCE_HEIGHT = 22.5
+
+REGRESSION_DIR = "./data/regression"
+GOLDEN_PATHS = {
+    "oxford_snipped": os.path.join(REGRESSION_DIR, "oxford_snipped_golden.json"),
+    "synthetic": os.path.join(REGRESSION_DIR, "synthetic_golden.json"),
+}
+THROUGHPUT_BASELINE_PATH = os.path.join(REGRESSION_DIR, "throughput_baseline.json")
+
+SYNTHETIC_FRAMES = 100
+SYNTHETIC_DETECTIONS_PER_FRAME = 20
+SYNTHETIC_SEED = 0
+
+# Fraction of the baseline frames per second which can be lost before the run is flagged as a regression.
+# Throughput is machine dependent, so re-record the baseline (--record) when moving to new hardware.
+FPS_TOLERANCE = 0.25
+
+# -------------------------------------------------------------
+
+parser = argparse.ArgumentParser(description="Checks the pipeline against golden outputs and a throughput baseline.")
+parser.add_argument("--record", action="store_true",
+                    help="Overwrite the golden outputs and throughput baseline with the results of this run.")
+parser.add_argument("--skip-throughput", action="store_true",
+                    help="Only check the overlap flags and ellipse parameters.")
+args = parser.parse_args()
+
+cap = cv2.VideoCapture(VIDEO_INPUT_PATH)
+
+VIDEO_WIDTH = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+VIDEO_HEIGHT = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+TOTAL_FRAMES = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+cap.set(cv2.CAP_PROP_POS_FRAMES, 1.0)
+res, image = cap.read()
+cap.release()
+
+calibration_coords = calibrate(image, CALIBRATION_COORDS_PATH)
+pts = np.array(calibration_coords, dtype = "float32")
+warped, M = four_point_transform(image, pts)
+
+raw_detections = get_raw_detections(local_run=True,
+                                    video_input_path=VIDEO_INPUT_PATH,
+                                    detections_file=DETECTIONS_FILE)
+
+cases = {
+    "oxford_snipped": (sort_detections(raw_detections, TOTAL_FRAMES),
+                       video_frames(VIDEO_INPUT_PATH, TOTAL_FRAMES)),
+    "synthetic": (sort_detections(synthetic_detections(SYNTHETIC_FRAMES,
+                                                       SYNTHETIC_DETECTIONS_PER_FRAME,
+                                                       VIDEO_WIDTH,
+                                                       VIDEO_HEIGHT,
+                                                       seed=SYNTHETIC_SEED), SYNTHETIC_FRAMES),
+                  blank_frames(SYNTHETIC_FRAMES, VIDEO_WIDTH, VIDEO_HEIGHT)),
+}
+
+print(Back.BLUE + f"Social Distance Calculator regression check")
+print(f"-------------------------------------------")
+
+failed = False
+throughput = {}
+
+for name, (sorted_detections, frames) in cases.items():
+    outputs = collect_outputs(sorted_detections, M, PHYSICAL_DISTANCE, REFERENCE_HEIGHT)
+
+    if args.record:
+        os.makedirs(REGRESSION_DIR, exist_ok=True)
+        save_json(outputs, GOLDEN_PATHS[name])
+        print(f"Recorded golden outputs for {Style.BRIGHT}{name}{Style.RESET_ALL} at {GOLDEN_PATHS[name]}")
+    else:
+        mismatches = compare_outputs(outputs, load_json(GOLDEN_PATHS[name]))
+        if mismatches:
+            failed = True
+            print(f"{Fore.RED}Correctness regression{Style.RESET_ALL} in {Style.BRIGHT}{name}{Style.RESET_ALL}: "
+                  f"{len(mismatches)} mismatching frame(s)")
+            for mismatch in mismatches[:10]:
+                print(f"    {mismatch}")
+        else:
+            print(f"{Fore.GREEN}Outputs match{Style.RESET_ALL} the golden outputs for {Style.BRIGHT}{name}{Style.RESET_ALL}")
+
+    if not args.skip_throughput:
+        throughput[name] = measure_throughput(frames, sorted_detections, M, PHYSICAL_DISTANCE, REFERENCE_HEIGHT)
+
+if throughput:
+    print(f"-------------------------------------------")
+    if args.record:
+        save_json(throughput, THROUGHPUT_BASELINE_PATH)
+        print(f"Recorded throughput baseline at {THROUGHPUT_BASELINE_PATH}")
+    else:
+        baseline = load_json(THROUGHPUT_BASELINE_PATH)
+
+    for name, fps in throughput.items():
+        if args.record:
+            print(f"{Style.BRIGHT}{name}{Style.RESET_ALL}: {fps:.1f} fps")
+            continue
+
+        minimum_fps = baseline[name] * (1 - FPS_TOLERANCE)
+        if fps < minimum_fps:
+            failed = True
+            colour = Fore.RED
+        else:
+            colour = Fore.GREEN
+        print(f"{Style.BRIGHT}{name}{Style.RESET_ALL}: {colour}{fps:.1f} fps{Style.RESET_ALL} "
+              f"(baseline {baseline[name]:.1f} fps, minimum {minimum_fps:.1f} fps)")
+
+print(f"-------------------------------------------")
+if failed:
+    print(f"{Fore.RED}Regression check failed!")
+    sys.exit(1)
+
+print(f"{Fore.GREEN}Regression check passed!")
+
+# -------------------------------------------------------------
@@ -0,0 +1,38 @@
+from service.server import create_server
+
+import json
+from colorama import Fore, Back, Style
+from colorama import init
+init(autoreset=True)
+
+# ----------------------- SETTINGS -----------------------------
+
+with open('settings.json') as f:
+    settings = json.load(f)
+
+SERVICE_HOST = settings.get('SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT = settings.get('SERVICE_PORT', 8080)
+SERVICE_WORKERS = settings.get('SERVICE_WORKERS', 2)
+
+# -------------------------------------------------------------
+
+if __name__ == '__main__':
+    server = create_server(settings, SERVICE_HOST, SERVICE_PORT, SERVICE_WORKERS)
+
+    print(Back.BLUE + f"Social Distance Calculator service")
+    print(
+        f"------------------------------------------- \n"
+        f"Listening on {Style.BRIGHT}http://{SERVICE_HOST}:{SERVICE_PORT}{Style.RESET_ALL} "
+        f"with {Fore.MAGENTA}{SERVICE_WORKERS}{Style.RESET_ALL} warm workers. \n"
+        f"-------------------------------------------"
+    )
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down...")
+    finally:
+        server.server_close()
+        server.job_manager.shutdown()
+
+# -------------------------------------------------------------
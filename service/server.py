@@ -0,0 +1,332 @@
+import collections
+import json
+import multiprocessing
+import queue
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .worker import worker_loop
+
+# Job states which are never changed again once reached.
+FINISHED_STATUSES = ['done', 'failed', 'cancelled']
+
+# How long, in seconds, the listener waits for updates before checking that the workers are still alive.
+WORKER_CHECK_INTERVAL = 1
+
+# Finished jobs are forgotten once they are older than FINISHED_JOB_RETENTION seconds, or once there are more than
+# MAX_FINISHED_JOBS of them, so a long running service does not keep every job it has ever seen.
+FINISHED_JOB_RETENTION = 24 * 60 * 60
+MAX_FINISHED_JOBS = 1000
+
+# Settings which each job may override. Anything not supplied falls back to the service's settings.json.
+DEFAULTED_KEYS = ['PHYSICAL_DISTANCE', 'REFERENCE_HEIGHT', 'BATCHED_DRAWING']
+REQUIRED_KEYS = ['VIDEO_INPUT_PATH', 'VIDEO_OUTPUT_PATH']
+
+JOB_PATH = re.compile(r"^/jobs/([0-9a-f]+)(/progress)?/?$")
+
+
+class JobManager:
+    """
+    Holds the queue of pending jobs, the pool of warm worker processes, and the status of every job submitted to the service.
+    Jobs are handed out by the service one at a time to idle workers, so it always knows which job each worker holds.
+
+    Args:
+        settings (dict): Contents of settings.json. Used for any parameters which a job does not supply.
+        num_workers (int): Number of worker processes to keep running.
+    """
+
+    def __init__(self, settings, num_workers):
+        self.settings = settings
+        self.jobs = {}
+        self.pending = collections.deque()
+        self.lock = threading.Lock()
+
+        self.status_queue = multiprocessing.Queue()
+        self.stop_event = multiprocessing.Event()
+        self.workers = [self._start_worker() for _ in range(num_workers)]
+
+        self.listener = threading.Thread(target=self._listen, daemon=True)
+        self.listener.start()
+
+    def submit(self, job):
+        """
+        Validates a job, fills in any missing parameters from the settings, and adds it to the queue.
+
+        Args:
+            job (dict): Job specification sent by the client.
+
+        Returns:
+            job_id (str): UID of the queued job.
+        """
+
+        missing = [key for key in REQUIRED_KEYS if not job.get(key)]
+        if job.get('DETECTIONS') is None and not job.get('DETECTIONS_FILE'):
+            missing.append('DETECTIONS or DETECTIONS_FILE')
+        if job.get('CALIBRATION_COORDS') is None and not job.get('CALIBRATION_COORDS_PATH'):
+            missing.append('CALIBRATION_COORDS or CALIBRATION_COORDS_PATH')
+        if missing:
+            raise ValueError(f"Missing job parameters: {', '.join(missing)}")
+        if job.get('BATCHED_DRAWING', False) not in [True, False, "True", "False"]:
+            raise ValueError(f"BATCHED_DRAWING must be true, false, \"True\" or \"False\", not {job['BATCHED_DRAWING']!r}")
+
+        job = dict(job)
+        for key in DEFAULTED_KEYS:
+            if key in self.settings:
+                job.setdefault(key, self.settings[key])
+
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self.jobs[job_id] = {"job_id": job_id,
+                                 "status": "queued",
+                                 "submitted": time.time(),
+                                 "frames_processed": 0,
+                                 "total_frames": None,
+                                 "video_input_path": job['VIDEO_INPUT_PATH'],
+                                 "video_output_path": job['VIDEO_OUTPUT_PATH']}
+            self.pending.append((job_id, job))
+            self._dispatch()
+
+        return job_id
+
+    def status(self, job_id):
+        """
+        Args:
+            job_id (str): UID of the job.
+
+        Returns:
+            dict: Copy of the current status of the job, or None if the job does not exist.
+        """
+
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def progress(self, job_id):
+        """
+        Args:
+            job_id (str): UID of the job.
+
+        Returns:
+            dict: Frames processed so far and the percentage complete, or None if the job does not exist.
+        """
+
+        job = self.status(job_id)
+        if job is None:
+            return None
+
+        percent_complete = None
+        if job['total_frames']:
+            percent_complete = round(job['frames_processed'] / job['total_frames'] * 100, 2)
+
+        return {"job_id": job_id,
+                "status": job['status'],
+                "frames_processed": job['frames_processed'],
+                "total_frames": job['total_frames'],
+                "percent_complete": percent_complete}
+
+    def list_jobs(self):
+        """
+        Returns:
+            list: Current status of every job, oldest first.
+        """
+
+        with self.lock:
+            return sorted((dict(job) for job in self.jobs.values()), key=lambda job: job['submitted'])
+
+    def shutdown(self):
+        """
+        Stops the workers once they have finished their current job.
+        Jobs which have not yet been started are not started, and are marked as cancelled.
+        """
+
+        with self.lock:
+            self.stop_event.set()
+            while self.pending:
+                job_id, _ = self.pending.popleft()
+                self._apply(job_id, {"status": "cancelled"})
+
+        for worker in self.workers:
+            worker['process'].join()
+
+        # The workers have exited, so everything they sent is already ahead of this in the status queue.
+        self.status_queue.put(None)
+        self.listener.join()
+
+        with self.lock:
+            for worker in self.workers:
+                if worker['job_id'] is not None:
+                    self._apply(worker['job_id'], {"status": "cancelled"})
+
+    def _start_worker(self):
+        job_queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=worker_loop,
+                                          args=(job_queue, self.status_queue, self.stop_event),
+                                          daemon=True)
+        process.start()
+        return {"process": process, "job_queue": job_queue, "job_id": None}
+
+    def _dispatch(self):
+        """
+        Hands pending jobs to any idle workers. The lock must be held by the caller.
+        """
+
+        if self.stop_event.is_set():
+            return
+
+        for worker in self.workers:
+            if not self.pending:
+                break
+            if worker['job_id'] is None and worker['process'].is_alive():
+                job_id, job = self.pending.popleft()
+                worker['job_id'] = job_id
+                worker['job_queue'].put((job_id, job))
+
+    def _update(self, job_id, update):
+        with self.lock:
+            self._apply(job_id, update)
+
+    def _apply(self, job_id, update):
+        """
+        Applies an update to a job, unless the job has already finished. Once a job finishes its worker is
+        given the next pending job, and old finished jobs are forgotten. The lock must be held by the caller.
+        """
+
+        job = self.jobs.get(job_id)
+        if job is None or job['status'] in FINISHED_STATUSES:
+            return
+
+        job.update(update)
+        if job['status'] in FINISHED_STATUSES:
+            job['finished'] = time.time()
+            for worker in self.workers:
+                if worker['job_id'] == job_id:
+                    worker['job_id'] = None
+            self._dispatch()
+            self._prune()
+
+    def _prune(self):
+        """
+        Forgets finished jobs which are past the retention window, and the oldest finished jobs beyond MAX_FINISHED_JOBS.
+        The lock must be held by the caller.
+        """
+
+        now = time.time()
+        finished = sorted((job['finished'], job_id) for job_id, job in self.jobs.items()
+                          if job['status'] in FINISHED_STATUSES)
+        excess = len(finished) - MAX_FINISHED_JOBS
+
+        for index, (finished_at, job_id) in enumerate(finished):
+            if index < excess or now - finished_at > FINISHED_JOB_RETENTION:
+                del self.jobs[job_id]
+
+    def _listen(self):
+        """
+        Applies the status and progress updates sent back by the workers, until shutdown sends None.
+        Whenever there are no updates waiting, checks that every worker is still alive.
+        """
+
+        while True:
+            try:
+                message = self.status_queue.get(timeout=WORKER_CHECK_INTERVAL)
+            except queue.Empty:
+                self._check_workers()
+                continue
+
+            if message is None:
+                break
+            self._update(*message)
+
+    def _check_workers(self):
+        """
+        Replaces any worker process which has died, and fails the job it was given so it is not left unfinished forever.
+        Only called once all of the updates sent by the workers have been applied.
+        """
+
+        with self.lock:
+            if self.stop_event.is_set():
+                return
+
+            for index, worker in enumerate(self.workers):
+                if worker['process'].is_alive():
+                    continue
+
+                self.workers[index] = self._start_worker()
+                if worker['job_id'] is not None:
+                    self._apply(worker['job_id'], {"status": "failed",
+                                                   "error": f"Worker process exited unexpectedly "
+                                                            f"(exit code {worker['process'].exitcode})"})
+            self._dispatch()
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP interface to the JobManager:
+        POST /jobs                  Queue a new job. Body is a .json job specification.
+        GET  /jobs                  Status of every job.
+        GET  /jobs/<job_id>         Status of a single job.
+        GET  /jobs/<job_id>/progress  Progress of a single job.
+    """
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/jobs':
+            return self._send_json(404, {"error": "Not found"})
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            job = json.loads(self.rfile.read(length))
+            if not isinstance(job, dict):
+                raise ValueError("Job specification must be a JSON object")
+            job_id = self.server.job_manager.submit(job)
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+
+        self._send_json(202, {"job_id": job_id, "status": "queued"})
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/jobs':
+            return self._send_json(200, self.server.job_manager.list_jobs())
+
+        match = JOB_PATH.match(self.path)
+        if match is None:
+            return self._send_json(404, {"error": "Not found"})
+
+        job_id, progress = match.groups()
+        if progress:
+            result = self.server.job_manager.progress(job_id)
+        else:
+            result = self.server.job_manager.status(job_id)
+
+        if result is None:
+            return self._send_json(404, {"error": f"No such job: {job_id}"})
+        self._send_json(200, result)
+
+    def _send_json(self, code, obj):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_server(settings, host, port, num_workers):
+    """
+    Starts the worker processes and creates the HTTP server. Call serve_forever on the result to start handling requests.
+
+    Args:
+        settings (dict): Contents of settings.json.
+        host (str): Address to bind the service to.
+        port (int): Port to bind the service to.
+        num_workers (int): Number of warm worker processes.
+
+    Returns:
+        server (http.server.ThreadingHTTPServer): Server with the JobManager attached as server.job_manager.
+    """
+
+    server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    server.job_manager = JobManager(settings, num_workers)
+
+    return server
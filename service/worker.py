@@ -0,0 +1,189 @@
+import cv2
+import numpy as np
+
+import json
+import os
+import queue
+import signal
+import traceback
+
+from calculations.calibration import sort_calibration_coords
+from calculations.ellipses import process_frame, trace, trace_batched
+from calculations.events import ViolationEventBuilder
+from calculations.homography import four_point_transform
+from inference.detect import get_raw_detections, sort_detections
+
+# How often, in frames, a worker reports its progress back to the service.
+PROGRESS_INTERVAL = 10
+
+
+def load_calibration(job, calibration_cache):
+    """
+    Gets the sorted calibration coordinates of a job. These can either be supplied inline, or as a path to an existing
+    calibration .json file. Files are cached, and only re-read if they have been modified since they were last loaded.
+    Unlike calibrate, this never prompts the user, as there is nobody watching a worker.
+
+    Args:
+        job (dict): Job specification.
+        calibration_cache (dict): Key: calibration file path
+                                  Value: (modification time, sorted calibration coordinates)
+
+    Returns:
+        np.array: Correctly ordered list of calibration coordinates
+    """
+
+    if job.get('CALIBRATION_COORDS') is not None:
+        return sort_calibration_coords(np.array(job['CALIBRATION_COORDS'], dtype="float32"))
+
+    path = job['CALIBRATION_COORDS_PATH']
+    modified = os.path.getmtime(path)
+    cached = calibration_cache.get(path)
+    if cached is None or cached[0] != modified:
+        with open(path) as f:
+            cached = (modified, sort_calibration_coords(np.array(json.load(f), dtype="float32")))
+        calibration_cache[path] = cached
+
+    return cached[1]
+
+
+def get_homography(pts, image, homography_cache):
+    """
+    Gets the homography matrix for a set of calibration coordinates, calculating it only the first time they are seen.
+
+    Args:
+        pts (np.array): 4*2 array of sorted calibration coordinates.
+        image (np.array): First frame of the input video.
+        homography_cache (dict): Key: calibration coordinates (tuple)
+                                 Value: 3*3 homography matrix
+
+    Returns:
+        M (np.array): 3*3 homography matrix. Used to transform any given point to bird's-eye view perspective.
+    """
+
+    key = tuple(pts.flatten().tolist())
+    if key not in homography_cache:
+        warped, M = four_point_transform(image, pts)
+        homography_cache[key] = M
+
+    return homography_cache[key]
+
+
+def run_job(job_id, job, status_queue, calibration_cache, homography_cache):
+    """
+    Processes a single job: traces the ellipses over every frame of the input video and saves the annotated video.
+    Violation events are also saved if the job asks for them.
+
+    Args:
+        job_id (str): UID of the job.
+        job (dict): Job specification. See service/server.py for the accepted keys.
+        status_queue (multiprocessing.Queue): Queue which progress updates are sent back to the service on.
+        calibration_cache (dict): Calibration coordinates which this worker has already loaded.
+        homography_cache (dict): Homography matrices which this worker has already calculated.
+    """
+
+    cap = cv2.VideoCapture(job['VIDEO_INPUT_PATH'])
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open video: {job['VIDEO_INPUT_PATH']}")
+
+    video_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    video_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    status_queue.put((job_id, {"total_frames": total_frames}))
+
+    if job.get('DETECTIONS') is not None:
+        raw_detections = job['DETECTIONS']
+    else:
+        raw_detections = get_raw_detections(local_run=True,
+                                            video_input_path=job['VIDEO_INPUT_PATH'],
+                                            detections_file=job['DETECTIONS_FILE'])
+    sorted_detections = sort_detections(raw_detections, total_frames)
+
+    writer = cv2.VideoWriter(job['VIDEO_OUTPUT_PATH'],
+                             cv2.VideoWriter_fourcc(*'mp4v'),
+                             fps,
+                             (video_width, video_height))
+
+    events_file = None
+    event_builder = None
+    if job.get('EVENTS_OUTPUT_PATH'):
+        events_file = open(job['EVENTS_OUTPUT_PATH'], 'w')
+        event_builder = ViolationEventBuilder(events_file, fps)
+
+    draw = trace_batched if job.get('BATCHED_DRAWING') in [True, "True"] else trace
+
+    frames_processed = 0
+    try:
+        M = None
+        for i in range(total_frames):
+            frame_no = i + 1
+            res, image = cap.read()
+            if not res:
+                break
+
+            if M is None:
+                M = get_homography(load_calibration(job, calibration_cache), image, homography_cache)
+
+            detections = sorted_detections[frame_no]
+            coords, draw_ellipse_requirements, are_coords_overlapped, ellipse_boxes = process_frame(detections,
+                                                                                                   M,
+                                                                                                   job['PHYSICAL_DISTANCE'],
+                                                                                                   job['REFERENCE_HEIGHT'])
+            if event_builder is not None:
+                event_builder.update(frame_no, detections, draw_ellipse_requirements, ellipse_boxes)
+
+            draw(image, coords, draw_ellipse_requirements, are_coords_overlapped)
+            writer.write(image)
+            frames_processed = frame_no
+
+            if frame_no % PROGRESS_INTERVAL == 0:
+                status_queue.put((job_id, {"frames_processed": frame_no}))
+    finally:
+        cap.release()
+        writer.release()
+        if event_builder is not None:
+            event_builder.close()
+            events_file.close()
+
+    # The frame count reported by some containers is only an estimate, so report what was actually written.
+    status_queue.put((job_id, {"status": "done", "frames_processed": frames_processed}))
+
+
+def worker_loop(job_queue, status_queue, stop_event):
+    """
+    Long running loop of a warm worker process. Jobs handed to this worker are processed until the stop event is set.
+    Calibration and homography caches live for as long as the worker, so repeat jobs on the same camera skip that work.
+
+    Args:
+        job_queue (multiprocessing.Queue): Queue of (job ID, job specification) tuples given to this worker by the service.
+        status_queue (multiprocessing.Queue): Queue which status and progress updates are sent back to the service on.
+        stop_event (multiprocessing.Event): Set by the service when the worker should exit.
+    """
+
+    # Ctrl+C is handled by the service, which shuts the workers down once they have finished their current job.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    calibration_cache = {}
+    homography_cache = {}
+
+    while True:
+        try:
+            job_id, job = job_queue.get(timeout=0.5)
+        except queue.Empty:
+            if stop_event.is_set():
+                break
+            continue
+
+        # The service may have started shutting down after it handed this worker the job.
+        if stop_event.is_set():
+            status_queue.put((job_id, {"status": "cancelled"}))
+            continue
+
+        status_queue.put((job_id, {"status": "running"}))
+        try:
+            run_job(job_id, job, status_queue, calibration_cache, homography_cache)
+        except Exception as e:
+            status_queue.put((job_id, {"status": "failed",
+                                       "error": f"{type(e).__name__}: {e}",
+                                       "traceback": traceback.format_exc()}))
@@ -0,0 +1,75 @@
+from calculations.homography import four_point_transform
+from calculations.calibration import calibrate
+from calculations.sweep import sweep
+from inference.detect import get_raw_detections, sort_detections
+
+import numpy as np
+import cv2
+
+import csv
+import json
+from colorama import Fore, Back, Style
+from colorama import init
+init(autoreset=True)
+
+# ----------------------- SETTINGS -----------------------------
+
+with open('settings.json') as f:
+    settings = json.load(f)
+
+VIDEO_INPUT_PATH = settings['VIDEO_INPUT_PATH']
+CALIBRATION_COORDS_PATH = settings['CALIBRATION_COORDS_PATH']
+DETECTIONS_FILE = settings['DETECTIONS_FILE']
+SWEEP_PARAMETERS = settings['SWEEP_PARAMETERS']
+SWEEP_OUTPUT_PATH = settings.get('SWEEP_OUTPUT_PATH', '')
+
+# -------------------------------------------------------------
+
+cap = cv2.VideoCapture(VIDEO_INPUT_PATH)
+TOTAL_FRAMES = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+cap.set(cv2.CAP_PROP_POS_FRAMES, 1.0)
+res, image = cap.read()
+cap.release()
+
+print(Back.BLUE + f"Social Distance Calculator parameter sweep")
+print(
+    f"------------------------------------------- \n"
+    f"Sweeping {Fore.MAGENTA}{len(SWEEP_PARAMETERS)}{Style.RESET_ALL} parameter sets over "
+    f"{Fore.MAGENTA}{TOTAL_FRAMES}{Style.RESET_ALL} frames. \n"
+    f"Grabbing local detections file from: {Style.BRIGHT}{DETECTIONS_FILE}{Style.RESET_ALL} \n"
+    f"-------------------------------------------"
+)
+
+calibration_coords = calibrate(image, CALIBRATION_COORDS_PATH)
+pts = np.array(calibration_coords, dtype = "float32")
+warped, M = four_point_transform(image, pts)
+
+raw_detections = get_raw_detections(local_run=True,
+                                    video_input_path=VIDEO_INPUT_PATH,
+                                    detections_file=DETECTIONS_FILE)
+sorted_detections = sort_detections(raw_detections, TOTAL_FRAMES)
+
+summaries = sweep(sorted_detections, M, SWEEP_PARAMETERS)
+
+columns = ["PHYSICAL_DISTANCE", "REFERENCE_HEIGHT", "violation_rate", "violations", "detections",
+           "frames_with_violations", "frames"]
+
+print(f"{'PHYSICAL_DISTANCE':>18} {'REFERENCE_HEIGHT':>17} {'Violation rate':>15} {'Violations':>11} "
+      f"{'Frames with violations':>23}")
+for summary in summaries:
+    print(f"{summary['PHYSICAL_DISTANCE']:>18} {summary['REFERENCE_HEIGHT']:>17} "
+          f"{Fore.RED}{summary['violation_rate'] * 100:>14.2f}%{Style.RESET_ALL} "
+          f"{summary['violations']:>5}/{summary['detections']:<5} "
+          f"{summary['frames_with_violations']:>11}/{summary['frames']:<11}")
+print(f"-------------------------------------------")
+
+if SWEEP_OUTPUT_PATH:
+    with open(SWEEP_OUTPUT_PATH, 'w', newline='') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=columns)
+        writer.writeheader()
+        for summary in summaries:
+            writer.writerow({column: summary[column] for column in columns})
+    print(f"Comparison table saved to: {Style.BRIGHT}{SWEEP_OUTPUT_PATH}{Style.RESET_ALL}")
+
+# -------------------------------------------------------------